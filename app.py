@@ -1,20 +1,32 @@
-from flask import Flask, request, jsonify, session, send_file
+from flask import Flask, request, jsonify, session, Response, stream_with_context, make_response
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_restful import Api, Resource, abort
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_session import Session
 from flasgger import Swagger
-from werkzeug.utils import secure_filename
+from streaming_form_data import StreamingFormDataParser, ParseFailedException
+from streaming_form_data.targets import FileTarget, SHA256Target
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import selectinload, raiseload
 from models import (
-    db, StudentInformation, CourseInformation, PaymentInformation, Admin,
-    StudentRules, StudentAgreement,
-    get_gender_statistics, get_age_group_statistics
+    db, StudentInformation, CourseInformation, PaymentInformation, Payment, Admin,
+    StudentRules, StudentAgreement, format_full_name,
+    get_gender_statistics, get_age_group_statistics, get_dashboard_statistics, clear_statistics_cache
 )
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import os
+import time
+from pathlib import Path
 import csv
+import hashlib
 import io
 import json
+import uuid
+import click
+import orjson
+import redis
 from functools import wraps
 from dotenv import load_dotenv
 
@@ -25,6 +37,40 @@ load_dotenv()
 app = Flask(__name__)
 api = Api(app)
 
+def dumps_json(data, option=orjson.OPT_APPEND_NEWLINE):
+    # Types orjson does not handle natively (Decimal, __html__ objects) fall back to Flask's encoder
+    return orjson.dumps(data, default=DefaultJSONProvider.default, option=orjson.OPT_NON_STR_KEYS | option)
+
+class OrjsonProvider(JSONProvider):
+    """Use orjson for jsonify() and request.get_json() as well as resource responses"""
+    def dumps(self, obj, **kwargs):
+        return dumps_json(obj, option=0).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = OrjsonProvider(app)
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Serialize resource responses with orjson"""
+    resp = make_response(dumps_json(data), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+def conditional_json(data, max_age=60):
+    """JSON response with an ETag, answering 304 when the client's copy is current"""
+    body = dumps_json(data)
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    # If-None-Match uses weak comparison (RFC 9110), so W/"..." and * also revalidate
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return resp
+
 # Swagger configuration
 swagger_config = {
     "openapi": "3.0.0",
@@ -53,10 +99,23 @@ swagger = Swagger(app, template_file='swagger.yml', config=swagger_config)
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///database.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Encode/decode JSON columns (objectives) with orjson
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'json_serializer': lambda obj: dumps_json(obj, option=0).decode(),
+    'json_deserializer': orjson.loads
+}
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'fallback-secret-key')
 app.config['UPLOAD_FOLDER'] = 'Uploads/passports'
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
 
+# Keep admin sessions server-side in Redis when configured; otherwise use signed cookies
+if os.getenv('REDIS_URL'):
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(os.getenv('REDIS_URL'))
+    app.config['SESSION_PERMANENT'] = True
+    app.config['PERMANENT_SESSION_LIFETIME'] = int(os.getenv('SESSION_LIFETIME', 8 * 60 * 60))  # seconds
+    Session(app)
+
 # Create upload directory
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -65,18 +124,73 @@ db.init_app(app)
 migrate = Migrate(app, db)
 
 # Enable CORS for API routes
+CORS_ORIGINS = ("http://localhost:4200", "http://127.0.0.1:5000", "http://localhost:5000")
 CORS(app, resources={r"/api/*": {
-    "origins": ["http://localhost:4200", "http://127.0.0.1:5000", "http://localhost:5000"],
+    "origins": CORS_ORIGINS,
     "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    "allow_headers": ["Content-Type", "Authorization", "X-Session-ID"]
+    "allow_headers": ["Content-Type", "Authorization", "X-Session-ID"],
+    "max_age": 86400  # Let browsers cache preflight responses for a day
 }}, supports_credentials=True)
 
 # Allowed file extensions for passport upload
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'pdf'})
+
+# Read size for streaming passport uploads to disk
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Unreferenced passport files younger than this are left for the next sweep
+PASSPORT_SWEEP_GRACE = 60 * 60  # seconds
 
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD string, returning None for empty values"""
+    return date.fromisoformat(value) if value else None
+
+# Fields that PUT requests may update directly; date fields are parsed and only set when non-empty
+STUDENT_FIELDS = ('surname', 'given_name', 'other_names', 'home_address', 'phone_number', 'email_address', 'gender')
+STUDENT_DATE_FIELDS = ('dob',)
+COURSE_FIELDS = ('preferred_course', 'objectives', 'prior_computer_knowledge', 'seek_employment_opportunities', 'hear_about_pediforte')
+COURSE_DATE_FIELDS = ('registration_date', 'resumption_date')
+PAYMENT_FIELDS = ('course_price', 'receipt_no')
+
+def _apply_fields(target, data, fields, date_fields=()):
+    """Copy the given fields from request data onto a model instance"""
+    for field in fields:
+        if field in data:
+            setattr(target, field, data[field])
+    for field in date_fields:
+        if data.get(field):
+            setattr(target, field, _parse_date(data[field]))
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def sweep_passport_files(grace=PASSPORT_SWEEP_GRACE):
+    """Delete files in the upload folder that no student references, returning how many.
+
+    Passports are content-addressed and may be shared, so requests never unlink them;
+    checking for references and unlinking would race with a request that has moved the
+    same file into place but not yet committed. Files modified within the last grace
+    seconds are skipped, which covers any such in-flight upload.
+    """
+    referenced = set(db.session.scalars(
+        select(StudentInformation.passport_path).where(StudentInformation.passport_path != None).distinct()
+    ))
+    cutoff = time.time() - grace
+    removed = 0
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.path not in referenced and entry.stat().st_mtime < cutoff:
+                _unlink(entry.path)
+                removed += 1
+    return removed
 
 def admin_required(f):
     @wraps(f)
@@ -95,6 +209,9 @@ class AdminLogin(Resource):
         
         admin = Admin.query.filter_by(username=data['username']).first()
         if admin and admin.check_password(data['password']):
+            # Persist a password hash upgraded by check_password
+            if db.session.is_modified(admin):
+                db.session.commit()
             session['admin_id'] = admin.id
             session['admin_username'] = admin.username
             return {
@@ -121,9 +238,13 @@ class AdminRegister(Resource):
             abort(400, message="Username, email and password required")
         
         # Check if admin already exists
-        if Admin.query.filter_by(username=data['username']).first():
+        username_taken, email_taken = db.session.query(
+            Admin.query.filter_by(username=data['username']).exists(),
+            Admin.query.filter_by(email=data['email']).exists()
+        ).one()
+        if username_taken:
             abort(400, message="Username already exists")
-        if Admin.query.filter_by(email=data['email']).first():
+        if email_taken:
             abort(400, message="Email already exists")
         
         admin = Admin(
@@ -141,16 +262,18 @@ class AdminRegister(Resource):
 class StudentRulesResource(Resource):
     def get(self):
         """Get active student rules (public endpoint)"""
-        active_rules = StudentRules.get_active_rules()
+        active_rules = StudentRules.get_active_rules_data()
         if not active_rules:
-            return {'rules_content': '', 'version': '1.0'}, 200
-        return active_rules.to_dict(), 200
+            return conditional_json({'rules_content': '', 'version': '1.0'})
+        return conditional_json(active_rules)
 
 class AdminStudentRulesResource(Resource):
     @admin_required
     def get(self):
         """Get all student rules versions (admin only)"""
-        rules = StudentRules.query.order_by(StudentRules.created_at.desc()).all()
+        rules = StudentRules.query.options(
+            selectinload(StudentRules.created_by_admin)
+        ).order_by(StudentRules.created_at.desc()).all()
         return [rule.to_dict() for rule in rules], 200
     
     @admin_required
@@ -164,7 +287,7 @@ class AdminStudentRulesResource(Resource):
         StudentRules.query.update({'is_active': False})
         
         # Create new version
-        version_number = len(StudentRules.query.all()) + 1
+        version_number = db.session.query(func.count(StudentRules.id)).scalar() + 1
         new_rules = StudentRules(
             rules_content=data['rules_content'],
             version=data.get('version', f'v{version_number}.0'),
@@ -174,6 +297,7 @@ class AdminStudentRulesResource(Resource):
         
         db.session.add(new_rules)
         db.session.commit()
+        StudentRules.clear_cache()
         
         return new_rules.to_dict(), 201
     
@@ -194,6 +318,7 @@ class AdminStudentRulesResource(Resource):
         active_rules.updated_at = datetime.utcnow()
         
         db.session.commit()
+        StudentRules.clear_cache()
         return active_rules.to_dict(), 200
 
 class StudentAgreementResource(Resource):
@@ -204,33 +329,27 @@ class StudentAgreementResource(Resource):
             abort(400, message="Student must agree to terms and conditions")
         
         student = StudentInformation.query.get_or_404(student_id)
+        # Read fresh, not from the per-worker cache, so agreements never name a deactivated version
         active_rules = StudentRules.get_active_rules()
         
         if not active_rules:
             abort(400, message="No active rules found")
         
-        # Check if student already agreed to current rules
-        existing_agreement = StudentAgreement.query.filter_by(
-            student_id=student_id,
-            rules_id=active_rules.id
-        ).first()
-        
-        if existing_agreement:
-            return {'message': 'Student has already agreed to current rules'}, 200
-        
-        # Create new agreement
-        agreement = StudentAgreement(
+        # Record agreement; the unique (student_id, rules_id) index rejects repeats
+        agreement = StudentAgreement.record(
             student_id=student_id,
             rules_id=active_rules.id,
             ip_address=request.environ.get('REMOTE_ADDR'),
             user_agent=request.headers.get('User-Agent', '')[:500]
         )
         
+        if agreement is None:
+            return {'message': 'Student has already agreed to current rules'}, 200
+        
         # Update student record
         student.terms_agreed = True
         student.terms_agreed_at = datetime.utcnow()
         
-        db.session.add(agreement)
         db.session.commit()
         
         return {
@@ -241,22 +360,30 @@ class StudentAgreementResource(Resource):
     @admin_required
     def get(self, student_id):
         """Get student's agreement history (admin only)"""
-        agreements = StudentAgreement.query.filter_by(student_id=student_id).all()
+        agreements = StudentAgreement.query.options(
+            selectinload(StudentAgreement.rules)
+        ).filter_by(student_id=student_id).all()
         return [agreement.to_dict() for agreement in agreements], 200
 
 class AdminRulesAnalytics(Resource):
     @admin_required
     def get(self):
         """Get rules agreement analytics"""
-        total_students = StudentInformation.query.count()
-        agreed_students = StudentInformation.query.filter_by(terms_agreed=True).count()
-        
-        active_rules = StudentRules.get_active_rules()
-        current_version_agreements = 0
-        if active_rules:
-            current_version_agreements = StudentAgreement.query.filter_by(
-                rules_id=active_rules.id
-            ).count()
+        # Count students, agreed students and current-version agreements, and look up the
+        # active rules version, in one query; the active rules come from the same
+        # ix_rules_active lookup as StudentRules.get_active_rules
+        active_rules = StudentRules.query.filter_by(is_active=True).order_by(StudentRules.id.desc()).limit(1)
+        agreements_count = db.session.query(
+            func.count(StudentAgreement.id)
+        ).filter(
+            StudentAgreement.rules_id == active_rules.with_entities(StudentRules.id).scalar_subquery()
+        ).scalar_subquery()
+        total_students, agreed_students, current_version_agreements, active_rules_version = db.session.query(
+            func.count(StudentInformation.id),
+            func.count(case((StudentInformation.terms_agreed == True, 1))),
+            agreements_count,
+            active_rules.with_entities(StudentRules.version).scalar_subquery()
+        ).one()
         
         return {
             'total_students': total_students,
@@ -264,7 +391,7 @@ class AdminRulesAnalytics(Resource):
             'students_not_agreed': total_students - agreed_students,
             'agreement_percentage': (agreed_students / total_students * 100) if total_students > 0 else 0,
             'current_version_agreements': current_version_agreements,
-            'active_rules_version': active_rules.version if active_rules else None
+            'active_rules_version': active_rules_version
         }, 200
 
 # Student Form Resources 
@@ -280,50 +407,23 @@ class StudentForm(Resource):
         if not data:
             abort(400, message="No data provided")
         
-        # Update student information
-        if 'surname' in data:
-            student_info.surname = data['surname']
-        if 'given_name' in data:
-            student_info.given_name = data['given_name']
-        if 'other_names' in data:
-            student_info.other_names = data['other_names']
-        if 'home_address' in data:
-            student_info.home_address = data['home_address']
-        if 'phone_number' in data:
-            student_info.phone_number = data['phone_number']
-        if 'email_address' in data:
-            student_info.email_address = data['email_address']
-        if 'dob' in data and data['dob']:
-            student_info.dob = datetime.strptime(data['dob'], '%Y-%m-%d').date()
-        if 'gender' in data:
-            student_info.gender = data['gender']
-
-        # Update course information
+        # Update student and course information
+        _apply_fields(student_info, data, STUDENT_FIELDS, STUDENT_DATE_FIELDS)
         if 'course_info' in data:
-            course_data = data['course_info']
-            if 'preferred_course' in course_data:
-                student_info.course_info.preferred_course = course_data['preferred_course']
-            if 'objectives' in course_data:
-                student_info.course_info.objectives = course_data['objectives']
-            if 'prior_computer_knowledge' in course_data:
-                student_info.course_info.prior_computer_knowledge = course_data['prior_computer_knowledge']
-            if 'seek_employment_opportunities' in course_data:
-                student_info.course_info.seek_employment_opportunities = course_data['seek_employment_opportunities']
-            if 'hear_about_pediforte' in course_data:
-                student_info.course_info.hear_about_pediforte = course_data['hear_about_pediforte']
-            if 'registration_date' in course_data and course_data['registration_date']:
-                student_info.course_info.registration_date = datetime.strptime(course_data['registration_date'], '%Y-%m-%d').date()
-            if 'resumption_date' in course_data and course_data['resumption_date']:
-                student_info.course_info.resumption_date = datetime.strptime(course_data['resumption_date'], '%Y-%m-%d').date()
+            _apply_fields(student_info.course_info, data['course_info'], COURSE_FIELDS, COURSE_DATE_FIELDS)
 
         student_info.updated_at = datetime.utcnow()
         db.session.commit()
+        clear_statistics_cache()
         
         return student_info.to_dict(include_payment=False), 200
 
 class StudentFormList(Resource):
     def get(self):
-        students = StudentInformation.query.all()
+        students = StudentInformation.query.options(
+            selectinload(StudentInformation.course_info),
+            raiseload('*')
+        ).all()
         return [student.to_dict(include_payment=False) for student in students], 200
 
     def post(self):
@@ -333,7 +433,7 @@ class StudentFormList(Resource):
 
         # Validate course selection
         course_data = data['course_info']
-        if course_data['preferred_course'] not in CourseInformation.COURSE_OPTIONS:
+        if course_data['preferred_course'] not in CourseInformation.COURSE_OPTIONS_SET:
             abort(400, message="Invalid course selection")
 
         # Check terms agreement
@@ -341,29 +441,10 @@ class StudentFormList(Resource):
             abort(400, message="You must agree to the terms and conditions to register")
 
         try:
-            # Create course information
-            course_info = CourseInformation(
-                preferred_course=course_data['preferred_course'],
-                objectives=course_data.get('objectives', {}),
-                prior_computer_knowledge=course_data.get('prior_computer_knowledge'),
-                seek_employment_opportunities=course_data.get('seek_employment_opportunities', False),
-                hear_about_pediforte=course_data.get('hear_about_pediforte'),
-                registration_date=datetime.strptime(course_data['registration_date'], '%Y-%m-%d').date() if course_data.get('registration_date') else None,
-                resumption_date=datetime.strptime(course_data['resumption_date'], '%Y-%m-%d').date() if course_data.get('resumption_date') else None
-            )
-            db.session.add(course_info)
-            db.session.flush()  
-
-            # Create payment information with default values
-            payment_info = PaymentInformation(
-                course_price=data.get('course_price', 0.0),
-                payment_method='cash',  # Default
-                payment_status='pending'
-            )
-            db.session.add(payment_info)
-            db.session.flush()  
+            active_rules = StudentRules.get_active_rules()
 
-            # Create student information
+            # Build the student together with its course and payment records;
+            # the unit of work inserts them in dependency order on commit
             new_student = StudentInformation(
                 surname=data['surname'],
                 given_name=data['given_name'],
@@ -371,28 +452,40 @@ class StudentFormList(Resource):
                 home_address=data.get('home_address'),
                 phone_number=data.get('phone_number'),
                 email_address=data['email_address'],
-                dob=datetime.strptime(data['dob'], '%Y-%m-%d').date() if data.get('dob') else None,
+                dob=_parse_date(data.get('dob')),
                 gender=data.get('gender'),
-                course_info_id=course_info.id,
-                payment_info_id=payment_info.id,
+                course_info=CourseInformation(
+                    preferred_course=course_data['preferred_course'],
+                    objectives=course_data.get('objectives', {}),
+                    prior_computer_knowledge=course_data.get('prior_computer_knowledge'),
+                    seek_employment_opportunities=course_data.get('seek_employment_opportunities', False),
+                    hear_about_pediforte=course_data.get('hear_about_pediforte'),
+                    registration_date=_parse_date(course_data.get('registration_date')),
+                    resumption_date=_parse_date(course_data.get('resumption_date'))
+                ),
+                # Payment information with default values
+                payment_info=PaymentInformation(
+                    course_price=data.get('course_price', 0.0),
+                    payment_method='cash',  # Default
+                    payment_status='pending'
+                ),
                 terms_agreed=True,
                 terms_agreed_at=datetime.utcnow()
             )
             db.session.add(new_student)
-            db.session.flush()  
 
             # Record terms agreement
-            active_rules = StudentRules.get_active_rules()
             if active_rules:
                 agreement = StudentAgreement(
-                    student_id=new_student.id,
-                    rules_id=active_rules.id,
+                    student=new_student,
+                    rules=active_rules,
                     ip_address=request.environ.get('REMOTE_ADDR'),
                     user_agent=request.headers.get('User-Agent', '')[:500]
                 )
                 db.session.add(agreement)
 
             db.session.commit()
+            clear_statistics_cache()
             return new_student.to_dict(include_payment=False), 201
 
         except Exception as e:
@@ -414,58 +507,25 @@ class AdminStudentForm(Resource):
         if not data:
             abort(400, message="No data provided")
         
-        # Update student information (same as student form)
-        if 'surname' in data:
-            student_info.surname = data['surname']
-        if 'given_name' in data:
-            student_info.given_name = data['given_name']
-        if 'other_names' in data:
-            student_info.other_names = data['other_names']
-        if 'home_address' in data:
-            student_info.home_address = data['home_address']
-        if 'phone_number' in data:
-            student_info.phone_number = data['phone_number']
-        if 'email_address' in data:
-            student_info.email_address = data['email_address']
-        if 'dob' in data and data['dob']:
-            student_info.dob = datetime.strptime(data['dob'], '%Y-%m-%d').date()
-        if 'gender' in data:
-            student_info.gender = data['gender']
-
-        # Update course information
+        # Update student and course information
+        _apply_fields(student_info, data, STUDENT_FIELDS, STUDENT_DATE_FIELDS)
         if 'course_info' in data:
-            course_data = data['course_info']
-            if 'preferred_course' in course_data:
-                student_info.course_info.preferred_course = course_data['preferred_course']
-            if 'objectives' in course_data:
-                student_info.course_info.objectives = course_data['objectives']
-            if 'prior_computer_knowledge' in course_data:
-                student_info.course_info.prior_computer_knowledge = course_data['prior_computer_knowledge']
-            if 'seek_employment_opportunities' in course_data:
-                student_info.course_info.seek_employment_opportunities = course_data['seek_employment_opportunities']
-            if 'hear_about_pediforte' in course_data:
-                student_info.course_info.hear_about_pediforte = course_data['hear_about_pediforte']
-            if 'registration_date' in course_data and course_data['registration_date']:
-                student_info.course_info.registration_date = datetime.strptime(course_data['registration_date'], '%Y-%m-%d').date()
-            if 'resumption_date' in course_data and course_data['resumption_date']:
-                student_info.course_info.resumption_date = datetime.strptime(course_data['resumption_date'], '%Y-%m-%d').date()
+            _apply_fields(student_info.course_info, data['course_info'], COURSE_FIELDS, COURSE_DATE_FIELDS)
 
         # Update payment information
         if 'payment_info' in data:
             payment_data = data['payment_info']
-            if 'course_price' in payment_data:
-                student_info.payment_info.course_price = payment_data['course_price']
+            _apply_fields(student_info.payment_info, payment_data, PAYMENT_FIELDS)
             if 'payment_method' in payment_data:
-                if payment_data['payment_method'] in PaymentInformation.PAYMENT_METHODS:
+                if payment_data['payment_method'] in PaymentInformation.PAYMENT_METHODS_SET:
                     student_info.payment_info.payment_method = payment_data['payment_method']
-            if 'receipt_no' in payment_data:
-                student_info.payment_info.receipt_no = payment_data['receipt_no']
             if 'payment_status' in payment_data:
-                if payment_data['payment_status'] in PaymentInformation.PAYMENT_STATUS:
+                if payment_data['payment_status'] in PaymentInformation.PAYMENT_STATUS_SET:
                     student_info.payment_info.payment_status = payment_data['payment_status']
 
         student_info.updated_at = datetime.utcnow()
         db.session.commit()
+        clear_statistics_cache()
         
         return student_info.to_dict(include_payment=True), 200
 
@@ -473,18 +533,21 @@ class AdminStudentForm(Resource):
     def delete(self, form_id):
         student_info = StudentInformation.query.get_or_404(form_id)
         
-        # Delete passport file if exists
-        if student_info.passport_path and os.path.exists(student_info.passport_path):
-            os.remove(student_info.passport_path)
-        
+        # The passport file may be shared; `flask sweep-passports` removes it once unreferenced
         db.session.delete(student_info)
         db.session.commit()
+        clear_statistics_cache()
+        
         return {'message': f"Student {form_id} deleted successfully"}, 200
 
 class AdminStudentFormList(Resource):
     @admin_required
     def get(self):
-        students = StudentInformation.query.all()
+        students = StudentInformation.query.options(
+            selectinload(StudentInformation.course_info),
+            selectinload(StudentInformation.payment_info).selectinload(PaymentInformation.history),
+            raiseload('*')
+        ).all()
         return [student.to_dict(include_payment=True) for student in students], 200
 
     @admin_required
@@ -495,35 +558,16 @@ class AdminStudentFormList(Resource):
 
         # Validate course selection
         course_data = data['course_info']
-        if course_data['preferred_course'] not in CourseInformation.COURSE_OPTIONS:
+        if course_data['preferred_course'] not in CourseInformation.COURSE_OPTIONS_SET:
             abort(400, message="Invalid course selection")
 
-        # Create course information
-        course_info = CourseInformation(
-            preferred_course=course_data['preferred_course'],
-            objectives=course_data.get('objectives', {}),
-            prior_computer_knowledge=course_data.get('prior_computer_knowledge'),
-            seek_employment_opportunities=course_data.get('seek_employment_opportunities', False),
-            hear_about_pediforte=course_data.get('hear_about_pediforte'),
-            registration_date=datetime.strptime(course_data['registration_date'], '%Y-%m-%d').date() if course_data.get('registration_date') else None,
-            resumption_date=datetime.strptime(course_data['resumption_date'], '%Y-%m-%d').date() if course_data.get('resumption_date') else None
-        )
-        db.session.add(course_info)
-        db.session.flush()
+        active_rules = StudentRules.get_active_rules() if data.get('terms_agreed') else None
 
-        # Create payment information
+        # Build the student together with its course and payment records;
+        # the unit of work inserts them in dependency order on commit
         payment_data = data.get('payment_info', {})
-        payment_info = PaymentInformation(
-            course_price=payment_data.get('course_price', 0.0),
-            amount_paid=payment_data.get('amount_paid', 0.0),
-            payment_method=payment_data.get('payment_method', 'cash'),
-            receipt_no=payment_data.get('receipt_no'),
-            payment_status=payment_data.get('payment_status', 'pending')
-        )
-        db.session.add(payment_info)
-        db.session.flush()
-
-        # Create student information
+        amount_paid = payment_data.get('amount_paid', 0.0)
+        payment_method = payment_data.get('payment_method', 'cash')
         new_student = StudentInformation(
             surname=data['surname'],
             given_name=data['given_name'],
@@ -531,57 +575,87 @@ class AdminStudentFormList(Resource):
             home_address=data.get('home_address'),
             phone_number=data.get('phone_number'),
             email_address=data['email_address'],
-            dob=datetime.strptime(data['dob'], '%Y-%m-%d').date() if data.get('dob') else None,
+            dob=_parse_date(data.get('dob')),
             gender=data.get('gender'),
-            course_info_id=course_info.id,
-            payment_info_id=payment_info.id,
+            course_info=CourseInformation(
+                preferred_course=course_data['preferred_course'],
+                objectives=course_data.get('objectives', {}),
+                prior_computer_knowledge=course_data.get('prior_computer_knowledge'),
+                seek_employment_opportunities=course_data.get('seek_employment_opportunities', False),
+                hear_about_pediforte=course_data.get('hear_about_pediforte'),
+                registration_date=_parse_date(course_data.get('registration_date')),
+                resumption_date=_parse_date(course_data.get('resumption_date'))
+            ),
+            payment_info=PaymentInformation(
+                course_price=payment_data.get('course_price', 0.0),
+                amount_paid=amount_paid,
+                payment_method=payment_method,
+                receipt_no=payment_data.get('receipt_no'),
+                payment_status=payment_data.get('payment_status', 'pending'),
+                # An amount already paid at registration starts the payment history
+                history=[Payment(
+                    amount=amount_paid,
+                    method=payment_method,
+                    receipt_no=payment_data.get('receipt_no')
+                )] if amount_paid else []
+            ),
             terms_agreed=data.get('terms_agreed', False),
             terms_agreed_at=datetime.utcnow() if data.get('terms_agreed') else None
         )
         db.session.add(new_student)
-        db.session.flush()
 
         # Record terms agreement if agreed
-        if data.get('terms_agreed'):
-            active_rules = StudentRules.get_active_rules()
-            if active_rules:
-                agreement = StudentAgreement(
-                    student_id=new_student.id,
-                    rules_id=active_rules.id,
-                    ip_address=request.environ.get('REMOTE_ADDR'),
-                    user_agent=request.headers.get('User-Agent', '')[:500]
-                )
-                db.session.add(agreement)
+        if active_rules:
+            agreement = StudentAgreement(
+                student=new_student,
+                rules=active_rules,
+                ip_address=request.environ.get('REMOTE_ADDR'),
+                user_agent=request.headers.get('User-Agent', '')[:500]
+            )
+            db.session.add(agreement)
 
         db.session.commit()
+        clear_statistics_cache()
 
         return new_student.to_dict(include_payment=True), 201
 
 # Passport Upload Resource
 class PassportUpload(Resource):
     def post(self, student_id):
-        if 'file' not in request.files:
-            abort(400, message="No file provided")
-        file = request.files['file']
-        if file.filename == '':
-            abort(400, message="No file selected")
-        if not allowed_file(file.filename):
-            abort(400, message="Invalid file type. Allowed: png, jpg, jpeg, gif, pdf")
-        student = StudentInformation.query.get_or_404(student_id)
-        # Delete old passport file if exists
-        if student.passport_path and os.path.exists(student.passport_path):
+        # Stream the multipart body straight to a temporary file in the upload folder,
+        # hashing it in the same pass so the stored file can be named by its content
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f".upload_{uuid.uuid4().hex}")
+        target = FileTarget(upload_path)
+        digest = SHA256Target()
+        try:
+            try:
+                parser = StreamingFormDataParser(headers=request.headers)
+                parser.register('file', target)
+                parser.register('file', digest)
+                while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+                    parser.data_received(chunk)
+            except ParseFailedException as e:
+                abort(400, message=f"Invalid upload: {str(e)}")
+            if target.multipart_filename is None:
+                abort(400, message="No file provided")
+            if target.multipart_filename == '':
+                abort(400, message="No file selected")
+            if not allowed_file(target.multipart_filename):
+                abort(400, message="Invalid file type. Allowed: png, jpg, jpeg, gif, pdf")
+            student = StudentInformation.query.get_or_404(student_id)
+            # Uploads are stored as <sha256>.<ext>, so identical files share one path
+            ext = target.multipart_filename.rpartition('.')[2].lower()
+            filename = f"{digest.value}.{ext}"
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            # Move the streamed file into place
             try:
-                os.remove(student.passport_path)
+                os.replace(upload_path, file_path)
             except OSError as e:
-                abort(500, message=f"Error deleting old file: {str(e)}")
-        # Save new file
-        filename = secure_filename(f"student_{student_id}_{file.filename}")
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        try:
-            file.save(file_path)
-        except Exception as e:
-            abort(500, message=f"Error saving file: {str(e)}")
-        # Update student record
+                abort(500, message=f"Error saving file: {str(e)}")
+        finally:
+            # Already gone once moved into place; removes the temporary file on any failure
+            _unlink(upload_path)
+        # Update student record; a replaced or uncommitted file is left for `flask sweep-passports`
         student.passport_filename = filename
         student.passport_path = file_path
         student.updated_at = datetime.utcnow()
@@ -597,20 +671,21 @@ class PassportUpload(Resource):
 class AdminDashboard(Resource):
     @admin_required
     def get(self):
-        total_students = StudentInformation.query.count()
-        course_stats = CourseInformation.get_course_statistics()
-        
-        # Recent registrations (last 30 days)
-        from datetime import timedelta
+        # Total and recent (last 30 days) registrations in one query
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_students = StudentInformation.query.filter(
-            StudentInformation.created_at >= thirty_days_ago
-        ).count()
+        total_students, recent_students = db.session.query(
+            func.count(StudentInformation.id),
+            func.count(case((StudentInformation.created_at >= thirty_days_ago, 1)))
+        ).one()
+        stats = get_dashboard_statistics()
         
         return {
             'total_students': total_students,
             'recent_registrations': recent_students,
-            'course_statistics': course_stats,
+            'course_statistics': stats['course'],
+            'gender_statistics': stats['gender'],
+            'age_group_statistics': stats['age'],
+            'payment_statistics': stats['payment'],
             'course_options': CourseInformation.COURSE_OPTIONS,
             'payment_methods': PaymentInformation.PAYMENT_METHODS
         }, 200
@@ -625,11 +700,30 @@ class ExportData(Resource):
         if format_type != 'csv':
             abort(400, message="Only CSV format supported currently")
         
-        students = StudentInformation.query.all()
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Plain column rows are enough for CSV, so skip ORM hydration and the identity map
+        stmt = select(
+            StudentInformation.id,
+            StudentInformation.surname,
+            StudentInformation.given_name,
+            StudentInformation.other_names,
+            StudentInformation.email_address,
+            StudentInformation.phone_number,
+            StudentInformation.home_address,
+            StudentInformation.dob,
+            StudentInformation.gender,
+            CourseInformation.preferred_course,
+            CourseInformation.registration_date,
+            CourseInformation.resumption_date,
+            PaymentInformation.course_price,
+            PaymentInformation.amount_paid,
+            PaymentInformation.payment_method,
+            PaymentInformation.receipt_no,
+            StudentInformation.created_at,
+            StudentInformation.terms_agreed,
+            StudentInformation.terms_agreed_at
+        ).outerjoin(StudentInformation.course_info).outerjoin(
+            StudentInformation.payment_info
+        ).order_by(StudentInformation.id).execution_options(yield_per=500)
         
         # headers
         headers = [
@@ -639,56 +733,61 @@ class ExportData(Resource):
             'Course Price', 'Amount Paid',
             'Payment Method', 'Receipt No', 'Created At', 'Terms Agreed', 'Terms Agreed At'
         ]
-        writer.writerow(headers)
-        
-        #  data
-        for student in students:
-            row = [
-                student.id,
-                student.full_name,
-                student.surname,
-                student.given_name,
-                student.other_names or '',
-                student.email_address,
-                student.phone_number or '',
-                student.home_address or '',
-                student.dob.isoformat() if student.dob else '',
-                student.gender or '',
-                student.course_info.preferred_course if student.course_info else '',
-                student.course_info.registration_date.isoformat() if student.course_info and student.course_info.registration_date else '',
-                student.course_info.resumption_date.isoformat() if student.course_info and student.course_info.resumption_date else '',
-                student.payment_info.course_price if student.payment_info else '',
-                student.payment_info.amount_paid if student.payment_info else '',
-                student.payment_info.payment_method if student.payment_info else '',
-                student.payment_info.receipt_no if student.payment_info else '',
-                student.created_at.isoformat() if student.created_at else '',
-                'Yes' if student.terms_agreed else 'No',
-                student.terms_agreed_at.isoformat() if student.terms_agreed_at else ''
-            ]
-            writer.writerow(row)
+        
+        def generate():
+            # Reuse one small buffer, emitting each CSV line as soon as it is written
+            output = io.StringIO()
+            writer = csv.writer(output)
+            
+            def flush_line(row):
+                writer.writerow(row)
+                line = output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+                return line
+            
+            yield flush_line(headers)
+            
+            #  data
+            for row in db.session.execute(stmt):
+                yield flush_line([
+                    row.id,
+                    format_full_name(row.surname, row.given_name, row.other_names),
+                    row.surname,
+                    row.given_name,
+                    row.other_names or '',
+                    row.email_address,
+                    row.phone_number or '',
+                    row.home_address or '',
+                    row.dob.isoformat() if row.dob else '',
+                    row.gender or '',
+                    row.preferred_course or '',
+                    row.registration_date.isoformat() if row.registration_date else '',
+                    row.resumption_date.isoformat() if row.resumption_date else '',
+                    '' if row.course_price is None else row.course_price,
+                    '' if row.amount_paid is None else row.amount_paid,
+                    row.payment_method or '',
+                    row.receipt_no or '',
+                    row.created_at.isoformat() if row.created_at else '',
+                    'Yes' if row.terms_agreed else 'No',
+                    row.terms_agreed_at.isoformat() if row.terms_agreed_at else ''
+                ])
         
         #  download
-        output.seek(0)
-        
-        # Create a BytesIO object for the response
-        mem = io.BytesIO()
-        mem.write(output.getvalue().encode('utf-8'))
-        mem.seek(0)
-        
-        return send_file(
-            mem,
-            as_attachment=True,
-            download_name=f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-            mimetype='text/csv'
+        filename = f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
 
 # Course Options Resource
 class CourseOptions(Resource):
     def get(self):
-        return {
+        return conditional_json({
             'courses': CourseInformation.COURSE_OPTIONS,
             'payment_methods': PaymentInformation.PAYMENT_METHODS
-        }, 200
+        })
 
 # Student Rules routes
 api.add_resource(StudentRulesResource, '/api/student-rules')
@@ -718,71 +817,59 @@ api.add_resource(ExportData, '/api/admin/export')
 # File upload routes
 api.add_resource(PassportUpload, '/api/students/<int:student_id>/passport')
 
+# Default student rules seeded by init_db, kept out of the code so they can be edited and diffed
+DEFAULT_RULES_PATH = Path(__file__).with_name('default_rules.txt')
+
 # Create database tables and admin
-with app.app_context():
+def init_db():
+    """Create tables, seed the default admin and student rules, and backfill payment history"""
     db.create_all()
     
+    # Seed everything in one transaction, committed once at the end
+    default_admin = Admin.query.first()
+    has_rules = db.session.query(StudentRules.query.exists()).scalar()
+    
     # Create default admin if none exists
-    if not Admin.query.first():
+    if not default_admin:
         default_admin = Admin(
             username=os.getenv('ADMIN_USERNAME', 'admin'),
             email=os.getenv('ADMIN_EMAIL', 'admin@pediforte.com')
         )
         default_admin.set_password(os.getenv('ADMIN_PASSWORD', 'admin123'))
         db.session.add(default_admin)
-        db.session.commit()
 
     # Create default student rules if none exist
-    if not StudentRules.query.first():
-        default_rules_content = """Student Rules (Please read carefully)
-
-1. Students will be given timetable after registration all students are required to follow the time specified on the timetable or the instructor, except there is a public holiday, or the instructor notifies a change in the class schedule.
-
-2. Students are to be respectable to the instructors and the school administrators.
+    if not has_rules:
+        default_rules_content = DEFAULT_RULES_PATH.read_text(encoding='utf-8').strip()
 
-3. Students are required to come with their own laptops.
-
-4. In case a student has to resume school or any other personal engagements, the school should be notified in advance if the student is planning to come back to complete their course in the future.
-
-5. Students are required to complete all projects and assignments issued by instructors or administrators.
-
-6. All documents and projects given to the student must be treated as confidential intellectual properties unless stated otherwise by the instructors.
-
-7. Students must not engage in activities that may be regarded as a disturbance to the school or disrupt ongoing classes.
-
-8. Students are expected to complete their courses within 6 months after which another full payment must be made to continue taking the same course.
-
-9. Alcohol, smoking accessories, weapons, or hard drugs are not allowed on the school premises.
-
-10. Business activities between students (legal or illegal) are not allowed in school premises.
-
-11. Students caught engaged in the below activities within school premises will be expelled without a refund:
-    a. Fighting
-    b. Smoking or taking hard drugs
-    c. Cyber crimes and other illegal activities.
-
-12. All payments must be completed before the duration of the course ends.
-
-13. Certificates will only be issued if all payments are completed.
-
-14. No refund will be issued under any circumstances.
-
-15. Pediforte reserves the right to expel any student that breaks any of these rules.
-
-16. Pediforte reserves the right to make changes to these rules anytime.
-
-I, (student name) have read and promise to abide by the student rules outlined above."""
-
-        default_admin = Admin.query.first()
         default_rules = StudentRules(
             rules_content=default_rules_content,
             version='1.0',
             is_active=True,
-            created_by=default_admin.id
+            created_by_admin=default_admin
         )
         db.session.add(default_rules)
-        db.session.commit()
+    
+    # Payment statistics read the payment table, so give amounts paid before it existed a row
+    Payment.backfill_from_amount_paid()
+    
+    db.session.commit()
+    clear_statistics_cache()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create database tables and seed default data"""
+    init_db()
+    click.echo('Database initialized')
+
+@app.cli.command('sweep-passports')
+def sweep_passports_command():
+    """Delete passport files no student references"""
+    removed = sweep_passport_files()
+    click.echo(f'Removed {removed} unreferenced passport file(s)')
 
 # Run the app
 if __name__ == '__main__':
+    with app.app_context():
+        init_db()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,8 @@
+import multiprocessing
+import os
+
+# Gunicorn configuration (picked up automatically by `gunicorn wsgi:application`)
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = 'gevent'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
@@ -1,10 +1,53 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date
-from werkzeug.security import generate_password_hash, check_password_hash
-import json
+import time
+from functools import wraps, cached_property
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from sqlalchemy import event, func, case, cast, literal, null, select, insert, update, bindparam, union_all, lambda_stmt
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 
 db = SQLAlchemy()
 
+# to_dict() methods return date/datetime values as-is; the API's orjson encoder
+# writes them as ISO 8601 strings
+
+# argon2id parameters for admin passwords (64 MiB, 2 passes, 2 lanes)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=2)
+
+# How long read-mostly results (active rules, statistics) are cached in-process
+ACTIVE_RULES_CACHE_TTL = 30  # seconds
+STATISTICS_CACHE_TTL = 30  # seconds
+
+# Rows sent per executemany INSERT by bulk imports
+BULK_INSERT_BATCH_SIZE = 10000
+
+def format_full_name(surname, given_name, other_names):
+    """Join the non-empty name parts, as shown in the API and the CSV export"""
+    return ' '.join(filter(None, (surname, given_name, other_names)))
+
+def ttl_cache(ttl):
+    """Cache a zero-argument function's result in-process for ttl seconds"""
+    def decorator(f):
+        state = {'value': None, 'expires_at': 0.0}
+        
+        @wraps(f)
+        def wrapper():
+            now = time.monotonic()
+            if now >= state['expires_at']:
+                state['value'] = f()
+                state['expires_at'] = now + ttl
+            return state['value']
+        
+        def cache_clear():
+            state['expires_at'] = 0.0
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
 class Admin(db.Model):
     __tablename__ = 'admin'
     id = db.Column(db.Integer, primary_key=True)
@@ -14,13 +57,31 @@ class Admin(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify a password, rehashing it when the stored hash is outdated"""
+        if not self.password_hash.startswith('$argon2'):
+            # Hashes created before the switch to argon2 are Werkzeug hashes
+            if not check_password_hash(self.password_hash, password):
+                return False
+            self.set_password(password)
+            return True
+        try:
+            password_hasher.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
 class StudentInformation(db.Model):
     __tablename__ = 'student_information'
+    __table_args__ = (
+        # Support the gender/age statistics; INCLUDE (id) allows index-only counts on PostgreSQL
+        db.Index('ix_student_gender', 'gender', postgresql_include=['id']),
+        db.Index('ix_student_dob', 'dob', postgresql_include=['id']),
+    )
     id = db.Column(db.Integer, primary_key=True)
     surname = db.Column(db.String(100), nullable=False)
     given_name = db.Column(db.String(100), nullable=False)
@@ -32,28 +93,25 @@ class StudentInformation(db.Model):
     gender = db.Column(db.String(20))
     passport_filename = db.Column(db.String(255))  # Store passport file name
     passport_path = db.Column(db.String(500))  # Store full file path
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Indexed for recent-registration counts
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Add this field to StudentInformation class
-    terms_agreed = db.Column(db.Boolean, default=False, nullable=False)
+    terms_agreed = db.Column(db.Boolean, default=False, nullable=False, index=True)
     terms_agreed_at = db.Column(db.DateTime)
     
     # Foreign Keys
     course_info_id = db.Column(db.Integer, db.ForeignKey('course_information.id'), nullable=False)
     payment_info_id = db.Column(db.Integer, db.ForeignKey('payment_information.id'), nullable=False)
     
-    # Relationships
+    # Relationships (list queries eager-load them with selectinload)
     course_info = db.relationship('CourseInformation', backref='student', uselist=False, cascade='all, delete-orphan', single_parent=True)
     payment_info = db.relationship('PaymentInformation', backref='student', uselist=False, cascade='all, delete-orphan', single_parent=True)
     
-    @property
+    @cached_property
     def full_name(self):
-        """Get full name"""
-        names = [self.surname, self.given_name]
-        if self.other_names:
-            names.append(self.other_names)
-        return ' '.join(names)
+        """Get full name (cached until a name changes or the instance is expired)"""
+        return format_full_name(self.surname, self.given_name, self.other_names)
     
     def to_dict(self, include_payment=False):
         """Convert to dictionary with optional payment info"""
@@ -66,24 +124,84 @@ class StudentInformation(db.Model):
             'home_address': self.home_address,
             'phone_number': self.phone_number,
             'email_address': self.email_address,
-            'dob': self.dob.isoformat() if self.dob else None,
+            'dob': self.dob,
             'gender': self.gender,
             'passport_filename': self.passport_filename,
             'passport_path': self.passport_path,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'course_info': self.course_info.to_dict() if self.course_info else None,
             'terms_agreed': self.terms_agreed,
-            'terms_agreed_at': self.terms_agreed_at.isoformat() if self.terms_agreed_at else None,
+            'terms_agreed_at': self.terms_agreed_at,
         }
         
         if include_payment and self.payment_info:
             data['payment_info'] = self.payment_info.to_dict()
             
         return data
+    
+    @staticmethod
+    def bulk_create_students(rows, batch_size=BULK_INSERT_BATCH_SIZE):
+        """Insert many students with their course and payment records, returning the new ids.
+
+        Each row is a dict of StudentInformation attributes plus 'course_info' and
+        'payment_info' dicts of attributes for the related records; a non-zero amount_paid
+        is also recorded as the first Payment. Rows are inserted with one executemany
+        INSERT per table per batch; the caller commits, so the whole import runs in one
+        transaction, then calls clear_statistics_cache() so the statistics include the
+        imported students.
+        """
+        student_ids = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            course_ids = db.session.scalars(
+                insert(CourseInformation).returning(CourseInformation.id, sort_by_parameter_order=True),
+                [row['course_info'] for row in batch]
+            ).all()
+            payment_ids = db.session.scalars(
+                insert(PaymentInformation).returning(PaymentInformation.id, sort_by_parameter_order=True),
+                [row['payment_info'] for row in batch]
+            ).all()
+            # An amount already paid at import starts the payment history, as in the admin create endpoint
+            initial_payments = [
+                {
+                    'payment_info_id': payment_id,
+                    'amount': row['payment_info']['amount_paid'],
+                    'method': row['payment_info'].get('payment_method'),
+                    'receipt_no': row['payment_info'].get('receipt_no')
+                }
+                for row, payment_id in zip(batch, payment_ids)
+                if row['payment_info'].get('amount_paid')
+            ]
+            if initial_payments:
+                db.session.execute(insert(Payment.__table__), initial_payments)
+            student_ids += db.session.scalars(
+                insert(StudentInformation).returning(StudentInformation.id, sort_by_parameter_order=True),
+                [
+                    {
+                        **{key: value for key, value in row.items() if key not in ('course_info', 'payment_info')},
+                        'course_info_id': course_id,
+                        'payment_info_id': payment_id
+                    }
+                    for row, course_id, payment_id in zip(batch, course_ids, payment_ids)
+                ]
+            ).all()
+        return student_ids
+
+def _reset_full_name(target, *args):
+    # target is None when an instance is expired after being garbage collected
+    if target is not None:
+        target.__dict__.pop('full_name', None)
+
+for _name_attr in (StudentInformation.surname, StudentInformation.given_name, StudentInformation.other_names):
+    event.listen(_name_attr, 'set', _reset_full_name)
+event.listen(StudentInformation, 'expire', _reset_full_name)
 
 class CourseInformation(db.Model):
     __tablename__ = 'course_information'
+    __table_args__ = (
+        db.Index('ix_course_preferred', 'preferred_course', postgresql_include=['id']),
+    )
     id = db.Column(db.Integer, primary_key=True)
     preferred_course = db.Column(db.String(100), nullable=False)
     objectives = db.Column(db.JSON, nullable=False)  # e.g., {"learn_html": True, "learn_python": False}
@@ -95,14 +213,15 @@ class CourseInformation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Course options as class variable
-    COURSE_OPTIONS = [
+    COURSE_OPTIONS = (
         'Fullstack Development',
         'Frontend Development', 
         'Cybersecurity',
         'Data Science',
         'Mobile App Development',
         'UI/UX Design'
-    ]
+    )
+    COURSE_OPTIONS_SET = frozenset(COURSE_OPTIONS)  # For validation; the tuple keeps display order
     
     def to_dict(self):
         return {
@@ -112,19 +231,16 @@ class CourseInformation(db.Model):
             'prior_computer_knowledge': self.prior_computer_knowledge,
             'seek_employment_opportunities': self.seek_employment_opportunities,
             'hear_about_pediforte': self.hear_about_pediforte,
-            'registration_date': self.registration_date.isoformat() if self.registration_date else None,
-            'resumption_date': self.resumption_date.isoformat() if self.resumption_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'registration_date': self.registration_date,
+            'resumption_date': self.resumption_date,
+            'created_at': self.created_at
         }
     
     @staticmethod
+    @ttl_cache(STATISTICS_CACHE_TTL)
     def get_course_statistics():
         """Get statistics for each course"""
-        from sqlalchemy import func
-        stats = db.session.query(
-            CourseInformation.preferred_course,
-            func.count(CourseInformation.id).label('student_count')
-        ).join(StudentInformation).group_by(CourseInformation.preferred_course).all()
+        stats = db.session.execute(_COURSE_STATS_STMT).all()
         
         return {course: count for course, count in stats}
 
@@ -134,15 +250,19 @@ class PaymentInformation(db.Model):
     course_price = db.Column(db.Float)
     amount_paid = db.Column(db.Float, default=0.0)
     payment_method = db.Column(db.String(50))  # 'cash' or 'bank_transfer'
-    payments = db.Column(db.Text)  # JSON string for payment history
     receipt_no = db.Column(db.String(50))
     payment_status = db.Column(db.String(50), default='pending')  # pending, partial, completed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Payment history, one Payment row per payment made
+    history = db.relationship('Payment', backref='payment_info', cascade='all, delete-orphan', order_by='Payment.id')
+    
     # Payment method options
-    PAYMENT_METHODS = ['cash', 'bank_transfer']
-    PAYMENT_STATUS = ['pending', 'partial', 'completed']
+    PAYMENT_METHODS = ('cash', 'bank_transfer')
+    PAYMENT_STATUS = ('pending', 'partial', 'completed')
+    PAYMENT_METHODS_SET = frozenset(PAYMENT_METHODS)
+    PAYMENT_STATUS_SET = frozenset(PAYMENT_STATUS)
     
     @property
     def balance(self):
@@ -167,8 +287,48 @@ class PaymentInformation(db.Model):
             self.payment_status = 'pending'
             
         # Update payment history
+        self.history.append(Payment(amount=amount, method=method, receipt_no=receipt_no))
         self.updated_at = datetime.utcnow()
     
+    @staticmethod
+    def bulk_apply_payments(rows):
+        """Apply many payments in one executemany UPDATE and one executemany INSERT of history.
+
+        rows is a list of {'id', 'amount', 'method', 'receipt_no'} dicts. Amount and status
+        are computed in SQL like add_payment; loaded instances are not refreshed, so use
+        this for imports rather than per-request updates. The caller commits, then calls
+        clear_statistics_cache() so the payment statistics reflect the new payments.
+        """
+        table = PaymentInformation.__table__
+        new_amount = func.coalesce(table.c.amount_paid, 0) + bindparam('b_amount')
+        # payment_status is set first so every dialect evaluates it against the old amount
+        stmt = update(table).where(table.c.id == bindparam('b_id')).ordered_values(
+            (table.c.payment_status, case(
+                (new_amount >= table.c.course_price, 'completed'),
+                (new_amount > 0, 'partial'),
+                else_='pending'
+            )),
+            (table.c.amount_paid, new_amount),
+            (table.c.payment_method, bindparam('b_method')),
+            (table.c.receipt_no, func.coalesce(bindparam('b_receipt_no'), table.c.receipt_no)),
+            (table.c.updated_at, bindparam('b_updated_at'))
+        )
+        now = datetime.utcnow()
+        db.session.execute(stmt, [{
+            'b_id': row['id'],
+            'b_amount': row['amount'],
+            'b_method': row['method'],
+            'b_receipt_no': row.get('receipt_no'),
+            'b_updated_at': now
+        } for row in rows])
+        db.session.execute(insert(Payment.__table__), [{
+            'payment_info_id': row['id'],
+            'amount': row['amount'],
+            'method': row['method'],
+            'receipt_no': row.get('receipt_no'),
+            'paid_at': now
+        } for row in rows])
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -176,30 +336,68 @@ class PaymentInformation(db.Model):
             'amount_paid': self.amount_paid,
             'balance': self.balance,
             'payment_method': self.payment_method,
-            'payments': json.loads(self.payments) if self.payments else [],
+            'payments': [payment.to_dict() for payment in self.history],
             'receipt_no': self.receipt_no,
             'payment_status': self.payment_status,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     @staticmethod
+    @ttl_cache(STATISTICS_CACHE_TTL)
     def get_payment_statistics():
-        """Get payment method statistics"""
-        from sqlalchemy import func
-        stats = db.session.query(
-            PaymentInformation.payment_method,
-            func.count(PaymentInformation.id).label('count'),
-            func.sum(PaymentInformation.amount_paid).label('total_amount')
-        ).group_by(PaymentInformation.payment_method).all()
+        """Get payment count and total amount for each payment method"""
+        stats = db.session.execute(_PAYMENT_STATS_STMT).all()
         
         return {
             method: {'count': count, 'total_amount': float(total_amount or 0)} 
             for method, count, total_amount in stats
         }
 
+class Payment(db.Model):
+    __tablename__ = 'payment'
+    __table_args__ = (
+        # Supports the per-method payment statistics; INCLUDE (amount) allows index-only sums on PostgreSQL
+        db.Index('ix_payment_method', 'method', postgresql_include=['amount']),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    payment_info_id = db.Column(db.Integer, db.ForeignKey('payment_information.id'), nullable=False, index=True)
+    amount = db.Column(db.Float, nullable=False)
+    method = db.Column(db.String(50))  # 'cash' or 'bank_transfer'
+    receipt_no = db.Column(db.String(50))
+    paid_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def backfill_from_amount_paid():
+        """Record one payment for each amount paid before payments were kept as rows.
+
+        Inserts a Payment for every PaymentInformation with a non-zero amount_paid and no
+        history yet, in one INSERT ... SELECT; safe to run repeatedly. The caller commits.
+        """
+        info = PaymentInformation.__table__
+        has_history = select(Payment.id).where(Payment.payment_info_id == info.c.id).exists()
+        db.session.execute(insert(Payment.__table__).from_select(
+            ['payment_info_id', 'amount', 'method', 'receipt_no', 'paid_at'],
+            select(
+                info.c.id, info.c.amount_paid, info.c.payment_method, info.c.receipt_no,
+                func.coalesce(info.c.updated_at, info.c.created_at)
+            ).where(info.c.amount_paid != 0, ~has_history)
+        ))
+    
+    def to_dict(self):
+        return {
+            'amount': self.amount,
+            'method': self.method,
+            'receipt_no': self.receipt_no,
+            'paid_at': self.paid_at
+        }
+
 class StudentRules(db.Model):
     __tablename__ = 'student_rules'
+    __table_args__ = (
+        # Only one version is active at a time, so this partial index stays tiny as history grows
+        db.Index('ix_rules_active', 'id', postgresql_where=db.text('is_active'), sqlite_where=db.text('is_active = 1')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     rules_content = db.Column(db.Text, nullable=False)
     version = db.Column(db.String(20), default='1.0')
@@ -219,17 +417,36 @@ class StudentRules(db.Model):
             'is_active': self.is_active,
             'created_by': self.created_by,
             'created_by_admin': self.created_by_admin.username if self.created_by_admin else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     @staticmethod
     def get_active_rules():
-        """Get the currently active rules"""
-        return StudentRules.query.filter_by(is_active=True).first()
+        """Get the currently active rules (the newest, should several be active)"""
+        return StudentRules.query.filter_by(is_active=True).order_by(StudentRules.id.desc()).first()
+    
+    @staticmethod
+    @ttl_cache(ACTIVE_RULES_CACHE_TTL)
+    def get_active_rules_data():
+        """Get the active rules as a dict, cached in-process for ACTIVE_RULES_CACHE_TTL seconds.
+
+        Each worker's copy may be stale after a rules change, so this is for the public
+        rules endpoint only; anything that records the rules id uses get_active_rules().
+        """
+        active_rules = StudentRules.get_active_rules()
+        return active_rules.to_dict() if active_rules else None
+    
+    @staticmethod
+    def clear_cache():
+        """Drop the cached active rules; call after any rules change is committed"""
+        StudentRules.get_active_rules_data.cache_clear()
 
 class StudentAgreement(db.Model):
     __tablename__ = 'student_agreement'
+    __table_args__ = (
+        db.Index('ix_student_agreement_student_rules', 'student_id', 'rules_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student_information.id'), nullable=False)
     rules_id = db.Column(db.Integer, db.ForeignKey('student_rules.id'), nullable=False)
@@ -247,32 +464,121 @@ class StudentAgreement(db.Model):
             'student_id': self.student_id,
             'rules_id': self.rules_id,
             'rules_version': self.rules.version if self.rules else None,
-            'agreed_at': self.agreed_at.isoformat() if self.agreed_at else None,
+            'agreed_at': self.agreed_at,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent
         }
+    
+    @staticmethod
+    def record(student_id, rules_id, ip_address=None, user_agent=None):
+        """Insert an agreement, returning None if the student already agreed to these rules"""
+        values = dict(student_id=student_id, rules_id=rules_id, ip_address=ip_address, user_agent=user_agent)
+        dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+        dialect = dialects.get(db.session.get_bind().dialect.name)
+        if dialect:
+            # INSERT ... ON CONFLICT DO NOTHING against the (student_id, rules_id) unique index
+            stmt = dialect.insert(StudentAgreement).values(**values).on_conflict_do_nothing(
+                index_elements=['student_id', 'rules_id']
+            ).returning(StudentAgreement)
+            return db.session.execute(stmt).scalar_one_or_none()
+        
+        # Other databases: rely on the unique index inside a savepoint
+        agreement = StudentAgreement(**values)
+        try:
+            with db.session.begin_nested():
+                db.session.add(agreement)
+        except IntegrityError:
+            return None
+        return agreement
+
+# Statistics statements, built once and cached by SQLAlchemy's lambda statement cache
+_GENDER_STATS_STMT = lambda_stmt(
+    lambda: select(StudentInformation.gender, func.count(StudentInformation.id))
+    .group_by(StudentInformation.gender)
+)
+_COURSE_STATS_STMT = lambda_stmt(
+    lambda: select(CourseInformation.preferred_course, func.count(CourseInformation.id))
+    .join(StudentInformation).group_by(CourseInformation.preferred_course)
+)
+_PAYMENT_STATS_STMT = lambda_stmt(
+    lambda: select(Payment.method, func.count(Payment.id), func.sum(Payment.amount))
+    .group_by(Payment.method)
+)
+
+def _adult_cutoff():
+    # Age is counted in calendar years, so adults were born before Jan 1 of (this year - 17)
+    return date(date.today().year - 17, 1, 1)
 
 # Utility functions for statistics
+@ttl_cache(STATISTICS_CACHE_TTL)
 def get_gender_statistics():
     """Get gender distribution statistics"""
-    from sqlalchemy import func
-    stats = db.session.query(
-        StudentInformation.gender,
-        func.count(StudentInformation.id).label('count')
-    ).group_by(StudentInformation.gender).all()
+    stats = db.session.execute(_GENDER_STATS_STMT).all()
     
     return {gender: count for gender, count in stats}
 
+@ttl_cache(STATISTICS_CACHE_TTL)
 def get_age_group_statistics():
     """Get age group statistics"""
-    students = StudentInformation.query.all()
-    adults = sum(1 for s in students if s.dob and (date.today().year - s.dob.year) >= 18)
-    minors = sum(1 for s in students if s.dob and (date.today().year - s.dob.year) < 18)
-    unknown = sum(1 for s in students if not s.dob)
+    adult_cutoff = _adult_cutoff()
+    # adult_cutoff is tracked as a bound parameter, so the compiled SQL is reused
+    adults, minors, unknown, total = db.session.execute(lambda_stmt(
+        lambda: select(
+            func.count(case((StudentInformation.dob < adult_cutoff, 1))),
+            func.count(case((StudentInformation.dob >= adult_cutoff, 1))),
+            func.count(case((StudentInformation.dob == None, 1))),
+            func.count(StudentInformation.id)
+        )
+    )).one()
     
     return {
         'adults': adults,
         'minors': minors,
         'unknown_age': unknown,
-        'total': len(students)
+        'total': total
     }
+
+@ttl_cache(STATISTICS_CACHE_TTL)
+def get_dashboard_statistics():
+    """Get gender, age group, course and payment statistics in a single round-trip"""
+    age_group = case(
+        (StudentInformation.dob == None, 'unknown_age'),
+        (StudentInformation.dob < _adult_cutoff(), 'adults'),
+        else_='minors'
+    )
+    # Typed so PostgreSQL can unify the column with the payment branch's SUM
+    no_total = cast(null(), db.Float)
+    # Each branch yields (kind, key, count, total_amount) rows; age_group's cutoff
+    # date is extracted as a bound parameter, so the compiled SQL is reused
+    stmt = lambda_stmt(lambda: union_all(
+        select(literal('gender'), StudentInformation.gender, func.count(StudentInformation.id), no_total)
+        .group_by(StudentInformation.gender),
+        select(literal('age'), age_group, func.count(StudentInformation.id), no_total)
+        .group_by(age_group),
+        select(literal('course'), CourseInformation.preferred_course, func.count(CourseInformation.id), no_total)
+        .join(StudentInformation).group_by(CourseInformation.preferred_course),
+        select(literal('payment'), Payment.method, func.count(Payment.id), func.sum(Payment.amount))
+        .group_by(Payment.method)
+    ))
+    
+    stats = {
+        'gender': {},
+        'age': {'adults': 0, 'minors': 0, 'unknown_age': 0, 'total': 0},
+        'course': {},
+        'payment': {}
+    }
+    for kind, key, count, total_amount in db.session.execute(stmt):
+        if kind == 'payment':
+            stats['payment'][key] = {'count': count, 'total_amount': float(total_amount or 0)}
+        elif kind == 'age':
+            stats['age'][key] = count
+            stats['age']['total'] += count
+        else:
+            stats[kind][key] = count
+    return stats
+
+def clear_statistics_cache():
+    """Drop the cached statistics; call after any student, course or payment change is committed"""
+    for helper in (get_gender_statistics, get_age_group_statistics, get_dashboard_statistics,
+                   CourseInformation.get_course_statistics, PaymentInformation.get_payment_statistics):
+        helper.cache_clear()
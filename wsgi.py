@@ -0,0 +1,18 @@
+# Patch blocking IO for gevent before anything else is imported
+from gevent import monkey
+monkey.patch_all()
+
+import os
+
+if os.getenv('DATABASE_URL', '').startswith(('postgres://', 'postgresql')):
+    # psycopg2 blocks the whole worker on every query unless it is made cooperative
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as e:
+        raise RuntimeError("psycogreen and psycopg2 are required to run gevent workers against PostgreSQL") from e
+    patch_psycopg()
+
+from app import app as application
+
+if __name__ == '__main__':
+    application.run(host='0.0.0.0', port=5000)